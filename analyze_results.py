@@ -5,12 +5,27 @@ This script provides comprehensive analysis and visualization of backtesting res
 """
 
 import os
+import sys
 import json
+import subprocess
 import yaml
-import glob
 from datetime import datetime
+from functools import lru_cache
 import argparse
 
+import numpy as np
+
+try:
+    import orjson  # Optional, faster trades.json parsing
+except ImportError:
+    orjson = None
+
+# libyaml-backed loader when PyYAML was built with it
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Prebuilt backtest CLI; override with HFT_BIN
+BACKTEST_BIN = os.environ.get('HFT_BIN', os.path.join('target', 'release', 'hft-backtest-engine'))
+
 class Colors:
     """ANSI color codes for terminal output"""
     RED = '\033[0;31m'
@@ -45,14 +60,33 @@ def print_info(text):
     """Print info message"""
     print(f"{Colors.CYAN}ℹ️  {text}{Colors.END}")
 
+@lru_cache(maxsize=8)
+def _load_trades_cached(trades_file, mtime):
+    """Parse a trades file; mtime is part of the cache key so edits invalidate it"""
+    if orjson is not None:
+        with open(trades_file, 'rb') as f:
+            return orjson.loads(f.read())
+
+    with open(trades_file, 'r') as f:
+        return json.load(f)
+
 def load_trades(run_dir):
     """Load trades from JSON file"""
     trades_file = os.path.join(run_dir, "trades.json")
     if not os.path.exists(trades_file):
         return None
     
-    with open(trades_file, 'r') as f:
-        return json.load(f)
+    return _load_trades_cached(trades_file, os.path.getmtime(trades_file))
+
+def load_yaml(path):
+    """Load a YAML file with the fastest available safe loader"""
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+@lru_cache(maxsize=1024)
+def _load_summary_cached(summary_file, mtime):
+    """Parse a summary file; mtime is part of the cache key so edits invalidate it"""
+    return load_yaml(summary_file)
 
 def load_summary(run_dir):
     """Load summary from YAML file"""
@@ -60,40 +94,43 @@ def load_summary(run_dir):
     if not os.path.exists(summary_file):
         return None
     
-    with open(summary_file, 'r') as f:
-        return yaml.safe_load(f)
+    return _load_summary_cached(summary_file, os.path.getmtime(summary_file))
 
 def analyze_trades(trades):
     """Perform detailed analysis on trades"""
     if not trades:
         return {}
     
+    # Materialize pnl/price/spread once as contiguous float64 columns
+    columns = np.array(
+        [(trade.get('pnl', 0), trade.get('price', 0), trade.get('spread', 0)) for trade in trades],
+        dtype=np.float64,
+    )
+    pnls, prices, spreads = columns[:, 0], columns[:, 1], columns[:, 2]
+
     # Basic statistics
     total_trades = len(trades)
-    total_pnl = sum(trade.get('pnl', 0) for trade in trades)
-    winning_trades = sum(1 for trade in trades if trade.get('pnl', 0) > 0)
-    losing_trades = sum(1 for trade in trades if trade.get('pnl', 0) < 0)
+    total_pnl = float(pnls.sum())
+    winning_trades = int(np.count_nonzero(pnls > 0))
+    losing_trades = int(np.count_nonzero(pnls < 0))
     
     # Calculate metrics
-    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-    avg_pnl = total_pnl / total_trades if total_trades > 0 else 0
+    win_rate = winning_trades / total_trades * 100
+    avg_pnl = total_pnl / total_trades
     
     # P/L distribution
-    pnls = [trade.get('pnl', 0) for trade in trades]
-    max_profit = max(pnls) if pnls else 0
-    max_loss = min(pnls) if pnls else 0
+    max_profit = float(pnls.max())
+    max_loss = float(pnls.min())
     
     # Price analysis
-    prices = [trade.get('price', 0) for trade in trades]
-    avg_price = sum(prices) / len(prices) if prices else 0
-    min_price = min(prices) if prices else 0
-    max_price = max(prices) if prices else 0
+    avg_price = float(prices.mean())
+    min_price = float(prices.min())
+    max_price = float(prices.max())
     
     # Spread analysis
-    spreads = [trade.get('spread', 0) for trade in trades]
-    avg_spread = sum(spreads) / len(spreads) if spreads else 0
-    min_spread = min(spreads) if spreads else 0
-    max_spread = max(spreads) if spreads else 0
+    avg_spread = float(spreads.mean())
+    min_spread = float(spreads.min())
+    max_spread = float(spreads.max())
     
     return {
         'total_trades': total_trades,
@@ -124,47 +161,78 @@ def display_strategy_results(run_dir, strategy_name):
         print_error(f"No data found in {run_dir}")
         return
     
+    lines = []
+    
     # Display summary from YAML
     if summary:
-        print(f"{Colors.PURPLE}📈 Summary Statistics:{Colors.END}")
-        print("-" * 50)
-        print(f"{'Total Trades':<20}: {summary.get('total_trades', 'N/A')}")
-        print(f"{'Winning Trades':<20}: {summary.get('winning_trades', 'N/A')}")
-        print(f"{'Win Rate':<20}: {summary.get('win_rate', 0) * 100:.2f}%")
-        print(f"{'Total P/L':<20}: ${summary.get('total_pnl', 0):.2f}")
-        print(f"{'Final Position':<20}: {summary.get('final_position_size', 'N/A')}")
-        print("-" * 50)
+        lines.append(f"{Colors.PURPLE}📈 Summary Statistics:{Colors.END}")
+        lines.append("-" * 50)
+        lines.append(f"{'Total Trades':<20}: {summary.get('total_trades', 'N/A')}")
+        lines.append(f"{'Winning Trades':<20}: {summary.get('winning_trades', 'N/A')}")
+        lines.append(f"{'Win Rate':<20}: {summary.get('win_rate', 0) * 100:.2f}%")
+        lines.append(f"{'Total P/L':<20}: ${summary.get('total_pnl', 0):.2f}")
+        lines.append(f"{'Final Position':<20}: {summary.get('final_position_size', 'N/A')}")
+        lines.append("-" * 50)
     
     # Detailed analysis
     if trades:
         analysis = analyze_trades(trades)
         
-        print(f"\n{Colors.PURPLE}📊 Detailed Analysis:{Colors.END}")
-        print("-" * 50)
-        print(f"{'Average P/L per Trade':<20}: ${analysis['avg_pnl']:.4f}")
-        print(f"{'Best Trade':<20}: ${analysis['max_profit']:.2f}")
-        print(f"{'Worst Trade':<20}: ${analysis['max_loss']:.2f}")
-        print(f"{'Average Price':<20}: ${analysis['avg_price']:.2f}")
-        print(f"{'Price Range':<20}: ${analysis['min_price']:.2f} - ${analysis['max_price']:.2f}")
-        print(f"{'Average Spread':<20}: ${analysis['avg_spread']:.4f}")
-        print(f"{'Spread Range':<20}: ${analysis['min_spread']:.4f} - ${analysis['max_spread']:.4f}")
-        print("-" * 50)
+        lines.append(f"\n{Colors.PURPLE}📊 Detailed Analysis:{Colors.END}")
+        lines.append("-" * 50)
+        lines.append(f"{'Average P/L per Trade':<20}: ${analysis['avg_pnl']:.4f}")
+        lines.append(f"{'Best Trade':<20}: ${analysis['max_profit']:.2f}")
+        lines.append(f"{'Worst Trade':<20}: ${analysis['max_loss']:.2f}")
+        lines.append(f"{'Average Price':<20}: ${analysis['avg_price']:.2f}")
+        lines.append(f"{'Price Range':<20}: ${analysis['min_price']:.2f} - ${analysis['max_price']:.2f}")
+        lines.append(f"{'Average Spread':<20}: ${analysis['avg_spread']:.4f}")
+        lines.append(f"{'Spread Range':<20}: ${analysis['min_spread']:.4f} - ${analysis['max_spread']:.4f}")
+        lines.append("-" * 50)
         
         # Performance assessment
         if analysis['total_pnl'] > 0:
-            print(f"{Colors.GREEN}💰 PROFITABLE STRATEGY!{Colors.END}")
+            lines.append(f"{Colors.GREEN}💰 PROFITABLE STRATEGY!{Colors.END}")
         elif analysis['total_pnl'] < 0:
-            print(f"{Colors.RED}💸 LOSS-MAKING STRATEGY{Colors.END}")
+            lines.append(f"{Colors.RED}💸 LOSS-MAKING STRATEGY{Colors.END}")
         else:
-            print(f"{Colors.YELLOW}⚖️  BREAK-EVEN STRATEGY{Colors.END}")
+            lines.append(f"{Colors.YELLOW}⚖️  BREAK-EVEN STRATEGY{Colors.END}")
         
         # Win rate assessment
         if analysis['win_rate'] > 60:
-            print(f"{Colors.GREEN}🎯 High Win Rate: {analysis['win_rate']:.1f}%{Colors.END}")
+            lines.append(f"{Colors.GREEN}🎯 High Win Rate: {analysis['win_rate']:.1f}%{Colors.END}")
         elif analysis['win_rate'] > 40:
-            print(f"{Colors.YELLOW}📊 Moderate Win Rate: {analysis['win_rate']:.1f}%{Colors.END}")
+            lines.append(f"{Colors.YELLOW}📊 Moderate Win Rate: {analysis['win_rate']:.1f}%{Colors.END}")
         else:
-            print(f"{Colors.RED}📉 Low Win Rate: {analysis['win_rate']:.1f}%{Colors.END}")
+            lines.append(f"{Colors.RED}📉 Low Win Rate: {analysis['win_rate']:.1f}%{Colors.END}")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def list_run_dirs(runs_dir):
+    """List run directories, newest first, using one scandir pass"""
+    with os.scandir(runs_dir) as it:
+        entries = [
+            (entry.path, entry.stat().st_mtime)
+            for entry in it
+            if entry.is_dir() and not entry.name.startswith('.')
+        ]
+    entries.sort(key=lambda entry: entry[1], reverse=True)
+    return [path for path, _ in entries]
+
+@lru_cache(maxsize=1024)
+def _strategy_name_cached(config_file, mtime):
+    """Read the strategy name from a run's config; mtime is part of the cache key"""
+    return load_yaml(config_file).get('name', 'Unknown')
+
+def load_run_overview(run_dir):
+    """Load the summary and strategy name for a run directory"""
+    summary = load_summary(run_dir)
+    strategy_name = "Unknown"
+    if summary:
+        # Try to determine strategy from config
+        config_file = os.path.join(run_dir, "config.yaml")
+        if os.path.exists(config_file):
+            strategy_name = _strategy_name_cached(config_file, os.path.getmtime(config_file))
+    return summary, strategy_name
 
 def list_all_results():
     """List all available results"""
@@ -175,39 +243,50 @@ def list_all_results():
         print_warning("No runs directory found.")
         return
     
-    run_dirs = sorted(glob.glob(os.path.join(runs_dir, "*")), key=os.path.getmtime, reverse=True)
+    run_dirs = list_run_dirs(runs_dir)
     
     if not run_dirs:
         print_warning("No results found. Run backtesting first.")
         return
     
-    print(f"{Colors.CYAN}Available Run Results:{Colors.END}")
-    print("-" * 80)
-    print(f"{'Run Directory':<25} {'Strategy':<20} {'Trades':<10} {'P/L':<15} {'Win Rate':<10}")
-    print("-" * 80)
+    lines = [f"{Colors.CYAN}Available Run Results:{Colors.END}"]
+    lines.append("-" * 80)
+    lines.append(f"{'Run Directory':<25} {'Strategy':<20} {'Trades':<10} {'P/L':<15} {'Win Rate':<10}")
+    lines.append("-" * 80)
     
     for run_dir in run_dirs:
         run_name = os.path.basename(run_dir)
-        summary = load_summary(run_dir)
+        summary, strategy_name = load_run_overview(run_dir)
         
         if summary:
-            strategy_name = "Unknown"
-            # Try to determine strategy from config
-            config_file = os.path.join(run_dir, "config.yaml")
-            if os.path.exists(config_file):
-                with open(config_file, 'r') as f:
-                    config = yaml.safe_load(f)
-                    strategy_name = config.get('name', 'Unknown')
-            
             total_trades = summary.get('total_trades', 0)
             total_pnl = summary.get('total_pnl', 0)
             win_rate = summary.get('win_rate', 0) * 100
             
-            print(f"{run_name:<25} {strategy_name[:19]:<20} {total_trades:<10} ${total_pnl:<14.2f} {win_rate:<9.1f}%")
+            lines.append(f"{run_name:<25} {strategy_name[:19]:<20} {total_trades:<10} ${total_pnl:<14.2f} {win_rate:<9.1f}%")
         else:
-            print(f"{run_name:<25} {'No Data':<20} {'N/A':<10} {'N/A':<15} {'N/A':<10}")
+            lines.append(f"{run_name:<25} {'No Data':<20} {'N/A':<10} {'N/A':<15} {'N/A':<10}")
+    
+    lines.append("-" * 80)
+    # Emit the whole block in one write instead of one print per line
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def run_backtest_cli(*args):
+    """Run the backtest CLI, preferring the prebuilt release binary over cargo"""
+    if os.path.exists(BACKTEST_BIN):
+        command = [BACKTEST_BIN, *args]
+    else:
+        # Builds target/release once, so later calls go straight to the binary
+        command = ['cargo', 'run', '--release', '--', *args]
     
-    print("-" * 80)
+    # Keep our buffered output ahead of the child's
+    sys.stdout.flush()
+    try:
+        subprocess.run(command, check=True)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        print_error(f"Command failed: {' '.join(command)} ({exc})")
+        return False
+    return True
 
 def main():
     parser = argparse.ArgumentParser(description='HFT Backtesting Engine - Results Analyzer')
@@ -277,14 +356,13 @@ def main():
             if strat_choice in strategies:
                 config_file, strategy_name = strategies[strat_choice]
                 print_success(f"Running {strategy_name}...")
-                os.system(f"cargo run -- run --config {config_file} --dataset-dir dataset")
                 # Find the latest run and analyze it
                 runs_dir = "runs"
-                if os.path.exists(runs_dir):
-                    run_dirs = sorted(glob.glob(os.path.join(runs_dir, "*")), key=os.path.getmtime, reverse=True)
+                if run_backtest_cli('run', '--config', config_file, '--dataset-dir', 'dataset') and os.path.exists(runs_dir):
+                    run_dirs = list_run_dirs(runs_dir)
                     if run_dirs:
                         latest_run = run_dirs[0]
-                        os.system(f"cargo run -- analyze {latest_run}")
+                        run_backtest_cli('analyze', latest_run)
                         display_strategy_results(latest_run, strategy_name)
             else:
                 print_error("Invalid strategy choice!")
@@ -4,45 +4,69 @@ Download XAU/USD tick data from Dukascopy and store daily files.
 
 Features:
 - Robust hourly downloads with retries and bounded concurrency
+- Hour decoding spread across worker processes (--parse-workers)
 - Correct parsing of Dukascopy .bi5 tick records (20 bytes, big-endian)
 - Millisecond UTC timestamps, ask/bid scaling with configurable factor
 - Resume: skip existing daily output unless --force
-- Output formats: CSV, CSV.GZ, or Parquet
+- Output formats: CSV, CSV.GZ, CSV.ZST, or Parquet
 - Progress and per-hour tick counts
 """
 
 import argparse
+import asyncio
+import contextlib
 import csv
 import gzip
+import io
 import lzma
-import struct
+import multiprocessing
+import os
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Iterator, Optional, Tuple
+from typing import List, Optional, Tuple
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
+import numpy as np
+
 try:
-    import pandas as pd  # Optional, used for Parquet output
+    import pandas as pd  # Optional, used for Parquet and fast CSV output
 except ImportError:
     pd = None
 
+try:
+    import httpx  # Optional, async pooled keep-alive connections for hour downloads
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  # Optional, enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import pyarrow as pa  # Optional, preferred for Parquet and required for CSV.ZST output
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 INSTRUMENT_DEFAULT = "XAUUSD"
 BASE_URL = "https://datafeed.dukascopy.com/datafeed/{instrument}/{year:04d}/{month:02d}/{day:02d}/{hour:02d}h_ticks.bi5"
 SCALE_FACTOR_DEFAULT = 1000.0  # Dukascopy gold is stored with three decimal places
 RECORD_SIZE = 20
-STRUCT_FMT = ">IIIII"  # msOffset, ask_raw, bid_raw, volume, ??? (unused)
+RECORD_DTYPE = np.dtype(">u4")  # 5 words per record: msOffset, ask_raw, bid_raw, volume, ??? (unused)
+RECORD_WORDS = RECORD_SIZE // RECORD_DTYPE.itemsize
 MAX_MS_PER_HOUR = 3_600_000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+USER_AGENT = "Mozilla/5.0 (compatible; tick-downloader/1.0)"
+COLUMNS = ["timestamp", "askPrice", "bidPrice"]
 
-
-@dataclass(frozen=True)
-class Tick:
-    ts_ms: int
-    ask: float
-    bid: float
+# Ticks travel as parallel (ts_ms int64, ask float64, bid float64) arrays, one entry per tick
+TickColumns = Tuple[np.ndarray, np.ndarray, np.ndarray]
 
 
 def parse_args() -> argparse.Namespace:
@@ -52,18 +76,21 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--instrument", default=INSTRUMENT_DEFAULT, help="Instrument, e.g., XAUUSD")
     parser.add_argument("--scale-factor", type=float, default=SCALE_FACTOR_DEFAULT, help="Price scale factor")
     parser.add_argument("--output", default="data_raw", help="Directory for daily output files")
-    parser.add_argument("--format", choices=["csv", "csv.gz", "parquet"], default="csv", help="Output format")
+    parser.add_argument("--format", choices=["csv", "csv.gz", "csv.zst", "parquet"], default="csv", help="Output format")
     parser.add_argument("--concurrency", type=int, default=8, help="Number of parallel hour downloads")
+    parser.add_argument(
+        "--parse-workers", type=int, default=os.cpu_count() or 1, help="Number of processes decoding hours"
+    )
     parser.add_argument("--retries", type=int, default=3, help="Retry attempts for transient errors")
     parser.add_argument("--force", action="store_true", help="Overwrite existing daily files")
     return parser.parse_args()
 
 
-def iterate_hours(start: datetime, end: datetime) -> Iterator[datetime]:
-    current = start
-    while current < end:
-        yield current
-        current += timedelta(hours=1)
+def hour_range(start: datetime, end: datetime) -> List[datetime]:
+    """
+    Hour starts in [start, end), built from offsets off 'start' in one pass.
+    """
+    return [start + timedelta(hours=i) for i in range((end - start) // timedelta(hours=1))]
 
 
 def hour_url(instrument: str, hour: datetime) -> str:
@@ -80,6 +107,40 @@ def ensure_output_dir(directory: Path) -> None:
     directory.mkdir(parents=True, exist_ok=True)
 
 
+@contextlib.asynccontextmanager
+async def no_http_client():
+    # contextlib.nullcontext only supports "async with" from Python 3.10
+    yield None
+
+
+def open_http_client(concurrency: int):
+    """
+    Shared async httpx client so hours reuse keep-alive (and HTTP/2 when available) connections.
+    Yields None when httpx is not installed; fetch_hour then falls back to urllib in a thread.
+    """
+    if httpx is None:
+        return no_http_client()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # urllib follows redirects on its own; httpx only does when asked
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=limits,
+        headers={"User-Agent": USER_AGENT},
+        timeout=30,
+        follow_redirects=True,
+    )
+
+
+async def fetch_hour(client, semaphore: asyncio.Semaphore, instrument: str, hour: datetime, retries: int) -> bytes:
+    """
+    Download a single hour while holding one of the --concurrency slots.
+    """
+    async with semaphore:
+        if client is None:
+            return await asyncio.to_thread(download_hour, instrument, hour, retries)
+        return await download_hour_async(client, hour_url(instrument, hour), retries)
+
+
 def download_hour(instrument: str, hour: datetime, retries: int = 3) -> bytes:
     """
     Download a single hour .bi5, return raw bytes (may be empty if 404/no data).
@@ -90,7 +151,7 @@ def download_hour(instrument: str, hour: datetime, retries: int = 3) -> bytes:
     backoff = 0.5
     while True:
         try:
-            req = Request(url, headers={"User-Agent": "Mozilla/5.0 (compatible; tick-downloader/1.0)"})
+            req = Request(url, headers={"User-Agent": USER_AGENT})
             with urlopen(req, timeout=30) as response:
                 return response.read()
         except HTTPError as exc:
@@ -113,6 +174,35 @@ def download_hour(instrument: str, hour: datetime, retries: int = 3) -> bytes:
             raise
 
 
+async def download_hour_async(client, url: str, retries: int) -> bytes:
+    """
+    httpx variant of download_hour with the same 404 and retry semantics.
+    """
+    attempt = 0
+    backoff = 0.5
+    while True:
+        try:
+            response = await client.get(url)
+        except httpx.TransportError:
+            if attempt < retries:
+                attempt += 1
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 8.0)
+                continue
+            raise
+        # 404 means hour has no data (weekend/holiday)
+        if response.status_code == 404:
+            return b""
+        # Retry on server errors
+        if 500 <= response.status_code < 600 and attempt < retries:
+            attempt += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 8.0)
+            continue
+        response.raise_for_status()
+        return response.content
+
+
 def sleep(seconds: float) -> None:
     try:
         import time
@@ -121,82 +211,246 @@ def sleep(seconds: float) -> None:
         pass
 
 
-def parse_ticks(hour: datetime, payload: bytes, scale_factor: float) -> Iterator[Tick]:
+def empty_columns() -> TickColumns:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+
+
+def hour_epoch_ms(hour: datetime) -> int:
+    """
+    UTC epoch milliseconds at the top of 'hour', computed once per hour with integer arithmetic.
+    """
+    start_of_hour = hour.replace(minute=0, second=0, microsecond=0, tzinfo=timezone.utc)
+    return (start_of_hour - EPOCH) // timedelta(milliseconds=1)
+
+
+def decompress_hour(payload: bytes) -> bytes:
+    """
+    Decompress a .bi5 payload. Dukascopy serves legacy .lzma ("alone") streams, so decode that
+    format directly rather than letting lzma.decompress probe the container and loop for more
+    concatenated streams. Decompressor objects are single-stream, so one is created per hour.
+    """
+    decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_ALONE)
+    raw = decompressor.decompress(payload)
+    if not decompressor.eof:
+        raise lzma.LZMAError("Compressed data ended before the end-of-stream marker")
+    return raw
+
+
+def parse_ticks(hour: datetime, payload: bytes, scale_factor: float) -> TickColumns:
     """
-    Parse Dukascopy hour payload into Tick objects.
+    Parse Dukascopy hour payload into (ts_ms, ask, bid) column arrays.
     """
     if not payload:
-        return iter(())
+        return empty_columns()
 
     try:
-        raw = lzma.decompress(payload)
+        raw = decompress_hour(payload)
     except lzma.LZMAError:
         # Malformed hour data; skip
-        return iter(())
+        return empty_columns()
 
     if len(raw) % RECORD_SIZE != 0:
         # Integrity check failed; skip this hour
-        return iter(())
+        return empty_columns()
 
-    start_of_hour = hour.replace(minute=0, second=0, microsecond=0)
-    for offset in range(0, len(raw), RECORD_SIZE):
-        ms_offset, ask_raw, bid_raw, _, _ = struct.unpack_from(STRUCT_FMT, raw, offset)
+    # View the whole buffer as big-endian records instead of unpacking one at a time
+    recs = np.frombuffer(raw, dtype=RECORD_DTYPE).reshape(-1, RECORD_WORDS)
 
-        # Validate ms offset within hour bounds
-        if ms_offset >= MAX_MS_PER_HOUR:
-            continue
+    # Validate ms offset within hour bounds; only copy the records out when some are invalid,
+    # otherwise keep decoding straight from the buffer view
+    valid = recs[:, 0] < MAX_MS_PER_HOUR
+    if not valid.all():
+        recs = recs[valid]
 
-        ts_ms = int((start_of_hour + timedelta(milliseconds=ms_offset)).timestamp() * 1000)
-        ask_price = ask_raw / scale_factor
-        bid_price = bid_raw / scale_factor
-        yield Tick(ts_ms=ts_ms, ask=ask_price, bid=bid_price)
+    ts_ms = hour_epoch_ms(hour) + recs[:, 0].astype(np.int64)
+    ask = recs[:, 1].astype(np.float64) / scale_factor
+    bid = recs[:, 2].astype(np.float64) / scale_factor
+    return ts_ms, ask, bid
 
 
-def write_day_csv(path: Path, ticks: Iterator[Tick]) -> int:
+def write_csv_columns(handle, ts_ms: np.ndarray, ask: np.ndarray, bid: np.ndarray) -> None:
     """
-    Write ticks to CSV at 'path'. Returns number of ticks written.
+    Row-by-row CSV fallback used when pandas is not installed.
     """
-    count = 0
+    writer = csv.writer(handle)
+    writer.writerow(COLUMNS)
+    for row in zip(ts_ms.tolist(), ask.tolist(), bid.tolist()):
+        # Prices are printed with 3 decimals to match Dukascopy scaling
+        writer.writerow([row[0], f"{row[1]:.3f}", f"{row[2]:.3f}"])
+
+
+def write_day_csv(path: Path, ts_ms: np.ndarray, ask: np.ndarray, bid: np.ndarray) -> int:
+    """
+    Write tick columns to CSV at 'path'. Returns number of ticks written.
+    """
+    if pd is not None:
+        df = pd.DataFrame({COLUMNS[0]: ts_ms, COLUMNS[1]: ask, COLUMNS[2]: bid})
+        df.to_csv(path, index=False, float_format="%.3f", lineterminator="\r\n")
+        return len(ts_ms)
     with path.open("w", newline="") as handle:
-        writer = csv.writer(handle)
-        writer.writerow(["timestamp", "askPrice", "bidPrice"])
-        for t in ticks:
-            # Prices are printed with 3 decimals to match Dukascopy scaling
-            writer.writerow([t.ts_ms, f"{t.ask:.3f}", f"{t.bid:.3f}"])
-            count += 1
-    return count
+        write_csv_columns(handle, ts_ms, ask, bid)
+    return len(ts_ms)
 
 
-def write_day_csv_gz(path: Path, ticks: Iterator[Tick]) -> int:
+def write_day_csv_gz(path: Path, ts_ms: np.ndarray, ask: np.ndarray, bid: np.ndarray) -> int:
     """
-    Write ticks to gzip-compressed CSV. Returns number of ticks.
+    Write tick columns to gzip-compressed CSV. Returns number of ticks.
     """
-    count = 0
+    if pd is not None:
+        df = pd.DataFrame({COLUMNS[0]: ts_ms, COLUMNS[1]: ask, COLUMNS[2]: bid})
+        df.to_csv(path, index=False, float_format="%.3f", lineterminator="\r\n", compression="gzip")
+        return len(ts_ms)
     with gzip.open(path, "wt", newline="") as handle:
-        writer = csv.writer(handle)
-        writer.writerow(["timestamp", "askPrice", "bidPrice"])
-        for t in ticks:
-            writer.writerow([t.ts_ms, f"{t.ask:.3f}", f"{t.bid:.3f}"])
-            count += 1
-    return count
+        write_csv_columns(handle, ts_ms, ask, bid)
+    return len(ts_ms)
+
+
+def tick_table(ts_ms: np.ndarray, ask: np.ndarray, bid: np.ndarray):
+    """
+    Wrap tick columns in a pyarrow table without copying them through Python objects.
+    """
+    return pa.table({
+        COLUMNS[0]: pa.array(ts_ms, type=pa.int64()),
+        COLUMNS[1]: pa.array(ask, type=pa.float64()),
+        COLUMNS[2]: pa.array(bid, type=pa.float64()),
+    })
+
+
+def write_day_csv_zst(path: Path, ts_ms: np.ndarray, ask: np.ndarray, bid: np.ndarray) -> int:
+    """
+    Write tick columns to zstd-compressed CSV through a pyarrow stream. Returns number of ticks.
+    """
+    if pa is None:
+        raise RuntimeError("CSV.ZST requires pyarrow. Please 'pip install pyarrow'.")
+    with pa.CompressedOutputStream(str(path), "zstd") as out, \
+            io.TextIOWrapper(out, encoding="utf-8", newline="") as handle:
+        if pd is not None:
+            df = pd.DataFrame({COLUMNS[0]: ts_ms, COLUMNS[1]: ask, COLUMNS[2]: bid})
+            df.to_csv(handle, index=False, float_format="%.3f", lineterminator="\r\n")
+        else:
+            write_csv_columns(handle, ts_ms, ask, bid)
+    return len(ts_ms)
 
 
-def write_day_parquet(path: Path, ticks: Iterator[Tick]) -> int:
+def write_day_parquet(path: Path, ts_ms: np.ndarray, ask: np.ndarray, bid: np.ndarray) -> int:
     """
-    Write ticks to Parquet using pandas. Returns number of ticks.
+    Write tick columns to Parquet (pyarrow, falling back to pandas). Returns number of ticks.
     """
+    # An empty day still produces a file with the expected schema
+    if pa is not None:
+        pq.write_table(tick_table(ts_ms, ask, bid), path, compression="zstd", use_dictionary=False)
+        return len(ts_ms)
     if pd is None:
-        raise RuntimeError("Parquet requires pandas. Please 'pip install pandas pyarrow'.")
-    # Collect in memory per-day (acceptable; day-sized chunk)
-    rows = [(t.ts_ms, t.ask, t.bid) for t in ticks]
-    if not rows:
-        # Create an empty file for consistency
-        df = pd.DataFrame(columns=["timestamp", "askPrice", "bidPrice"])
-        df.to_parquet(path, index=False)
-        return 0
-    df = pd.DataFrame(rows, columns=["timestamp", "askPrice", "bidPrice"])
+        raise RuntimeError("Parquet requires pyarrow or pandas. Please 'pip install pyarrow'.")
+    df = pd.DataFrame({COLUMNS[0]: ts_ms, COLUMNS[1]: ask, COLUMNS[2]: bid})
     df.to_parquet(path, index=False)
-    return len(rows)
+    return len(ts_ms)
+
+
+async def download_day(
+    client, semaphore: asyncio.Semaphore, parse_pool: ProcessPoolExecutor, args: argparse.Namespace, day_start: datetime
+) -> TickColumns:
+    """
+    Download and decode one UTC day, returning its (ts_ms, ask, bid) columns in hour order.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def fetch_and_parse(hour: datetime) -> TickColumns:
+        try:
+            payload = await fetch_hour(client, semaphore, args.instrument, hour, args.retries)
+        except Exception as exc:
+            print(f"✗ Failed {hour_url(args.instrument, hour)}: {exc}", file=sys.stderr)
+            payload = b""
+        # Decode in the process pool as soon as the hour arrives, overlapping the remaining downloads
+        return await loop.run_in_executor(parse_pool, parse_ticks, hour, payload, args.scale_factor)
+
+    hours = hour_range(day_start, day_start + timedelta(days=1))
+    hour_columns = await asyncio.gather(*(fetch_and_parse(h) for h in hours))
+
+    for h, (ts_ms, _, _) in zip(hours, hour_columns):
+        print(f"  Hour {h.strftime('%Y-%m-%d %H:00')} → {len(ts_ms)} ticks")
+    ts_parts, ask_parts, bid_parts = zip(*hour_columns)
+    return np.concatenate(ts_parts), np.concatenate(ask_parts), np.concatenate(bid_parts)
+
+
+def parse_pool_context():
+    """
+    Parse workers are started lazily, while download threads are already running, so they must
+    not be forked from this process. Use a forkserver where available, otherwise spawn.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def daily_path(output_dir: Path, instrument: str, fmt: str, day: datetime) -> Path:
+    # Each --format choice doubles as the file extension
+    return output_dir / f"{instrument.lower()}_ticks_{day.date()}.{fmt}"
+
+
+def write_day(daily_file: Path, fmt: str, day_columns: TickColumns) -> int:
+    """
+    Atomically write one day's columns in the requested format. Returns number of ticks.
+    """
+    # Atomic write: write to temp then rename
+    tmp_path = daily_file.with_suffix(daily_file.suffix + ".tmp")
+    try:
+        if fmt == "csv":
+            day_count = write_day_csv(tmp_path, *day_columns)
+        elif fmt == "csv.gz":
+            day_count = write_day_csv_gz(tmp_path, *day_columns)
+        elif fmt == "csv.zst":
+            day_count = write_day_csv_zst(tmp_path, *day_columns)
+        else:
+            day_count = write_day_parquet(tmp_path, *day_columns)
+
+        tmp_path.replace(daily_file)
+    finally:
+        # Cleanup temp on failure
+        if tmp_path.exists() and not daily_file.exists():
+            try:
+                tmp_path.unlink()
+            except Exception:
+                pass
+    return day_count
+
+
+async def download_days(
+    args: argparse.Namespace, start: datetime, end_inclusive: datetime, output_dir: Path
+) -> Tuple[int, int]:
+    """
+    Download every day in [start, end_inclusive). Returns (days, ticks).
+    """
+    # Resolve resume state from one directory listing so only missing days enter the pipeline
+    existing = set() if args.force else {p.name for p in output_dir.iterdir()}
+    all_days = [start + timedelta(days=i) for i in range((end_inclusive - start).days)]
+    missing_days = []
+    for day_start in all_days:
+        daily_file = daily_path(output_dir, args.instrument, args.format, day_start)
+        if daily_file.name in existing:
+            print(f"↪ Skipping existing {daily_file.name}")
+        else:
+            missing_days.append((day_start, daily_file))
+
+    # Hours from all missing days share the --concurrency download slots. Only enough whole
+    # days to keep those slots busy (plus one being written) are held in memory at a time.
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    days_in_flight = asyncio.Semaphore(-(-max(1, args.concurrency) // 24) + 1)
+
+    async with open_http_client(max(1, args.concurrency)) as client:
+        with ProcessPoolExecutor(max_workers=max(1, args.parse_workers), mp_context=parse_pool_context()) as parse_pool:
+
+            async def process_day(day_start: datetime, daily_file: Path) -> int:
+                async with days_in_flight:
+                    day_columns = await download_day(client, semaphore, parse_pool, args, day_start)
+                    # Write off the event loop so other days keep downloading meanwhile
+                    day_count = await asyncio.to_thread(write_day, daily_file, args.format, day_columns)
+                print(f"✔ {daily_file.name}: {day_count} ticks")
+                return day_count
+
+            day_counts = await asyncio.gather(*(process_day(d, f) for d, f in missing_days))
+
+    return len(all_days), sum(day_counts)
 
 
 def main() -> None:
@@ -219,81 +473,8 @@ def main() -> None:
     output_dir = Path(args.output)
     ensure_output_dir(output_dir)
 
-    total_ticks = 0
-    total_days = 0
-
-    day_start = start
     print(f"Downloading {args.instrument} ticks from {args.start_date} to {args.end_date} (UTC)")
-    while day_start < end_inclusive:
-        day_end = day_start + timedelta(days=1)
-
-        # Determine file path according to format
-        stem = f"{args.instrument.lower()}_ticks_{day_start.date()}"
-        if args.format == "csv":
-            daily_file = output_dir / f"{stem}.csv"
-        elif args.format == "csv.gz":
-            daily_file = output_dir / f"{stem}.csv.gz"
-        else:
-            daily_file = output_dir / f"{stem}.parquet"
-
-        if daily_file.exists() and not args.force:
-            print(f"↪ Skipping existing {daily_file.name}")
-            total_days += 1
-            day_start = day_end
-            continue
-
-        # Download hours in parallel
-        hours = list(iterate_hours(day_start, day_end))
-        hour_payloads: dict[datetime, bytes] = {}
-
-        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
-            futures = {
-                pool.submit(download_hour, args.instrument, h, args.retries): h for h in hours
-            }
-            for fut in as_completed(futures):
-                h = futures[fut]
-                try:
-                    hour_payloads[h] = fut.result()
-                except Exception as exc:
-                    print(f"✗ Failed {hour_url(args.instrument, h)}: {exc}", file=sys.stderr)
-                    hour_payloads[h] = b""
-
-        # Parse ticks hour-by-hour in chronological order
-        def day_ticks_iter() -> Iterator[Tick]:
-            for h in sorted(hour_payloads.keys()):
-                payload = hour_payloads[h]
-                ticks_iter = parse_ticks(h, payload, args.scale_factor)
-                # Optionally count ticks per hour for progress
-                count = 0
-                for t in ticks_iter:
-                    count += 1
-                    yield t
-                print(f"  Hour {h.strftime('%Y-%m-%d %H:00')} → {count} ticks")
-
-        # Atomic write: write to temp then rename
-        tmp_path = daily_file.with_suffix(daily_file.suffix + ".tmp")
-        try:
-            if args.format == "csv":
-                day_count = write_day_csv(tmp_path, day_ticks_iter())
-            elif args.format == "csv.gz":
-                day_count = write_day_csv_gz(tmp_path, day_ticks_iter())
-            else:
-                day_count = write_day_parquet(tmp_path, day_ticks_iter())
-
-            tmp_path.replace(daily_file)
-            print(f"✔ {daily_file.name}: {day_count} ticks")
-        finally:
-            # Cleanup temp on failure
-            if tmp_path.exists() and not daily_file.exists():
-                try:
-                    tmp_path.unlink()
-                except Exception:
-                    pass
-
-        total_ticks += day_count
-        total_days += 1
-        day_start = day_end
-
+    total_days, total_ticks = asyncio.run(download_days(args, start, end_inclusive, output_dir))
     print(f"Finished: {total_days} days from {args.start_date} to {args.end_date} → {total_ticks} ticks")
 
 
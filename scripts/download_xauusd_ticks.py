@@ -4,15 +4,16 @@
 import argparse
 import csv
 import lzma
-import struct
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Iterator
 from urllib.error import HTTPError, URLError
 from urllib.request import urlopen
 
+import numpy as np
+
 INSTRUMENT = "XAUUSD"
 BASE_URL = "https://datafeed.dukascopy.com/datafeed/{instrument}/{year:04d}/{month:02d}/{day:02d}/{hour:02d}h_ticks.bi5"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 SCALE_FACTOR = 1000.0  # Dukascopy stores gold prices with three decimal places
 
 
@@ -28,11 +29,8 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def iterate_hours(start: datetime, end: datetime) -> Iterator[datetime]:
-    current = start
-    while current < end:
-        yield current
-        current += timedelta(hours=1)
+def hour_range(start: datetime, end: datetime) -> list[datetime]:
+    return [start + timedelta(hours=i) for i in range((end - start) // timedelta(hours=1))]
 
 
 def hour_url(hour: datetime) -> str:
@@ -60,23 +58,24 @@ def download_hour(hour: datetime) -> bytes:
         raise
 
 
-def parse_ticks(hour: datetime, payload: bytes) -> Iterator[tuple[int, float, float]]:
+def hour_epoch_ms(hour: datetime) -> int:
+    start_of_hour = hour.replace(minute=0, second=0, microsecond=0, tzinfo=timezone.utc)
+    return (start_of_hour - EPOCH) // timedelta(milliseconds=1)
+
+
+def parse_ticks(hour: datetime, payload: bytes) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     if not payload:
-        return iter(())
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
 
     raw = lzma.decompress(payload)
     if len(raw) % 20 != 0:
-        return iter(())
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
 
-    start_of_hour = hour.replace(minute=0, second=0, microsecond=0)
-    for offset in range(0, len(raw), 20):
-        ms_offset, ask_raw, bid_raw, _, _ = struct.unpack_from(">IIIII", raw, offset)
-        timestamp = int(
-            (start_of_hour + timedelta(milliseconds=ms_offset)).timestamp() * 1000
-        )
-        ask_price = ask_raw / SCALE_FACTOR
-        bid_price = bid_raw / SCALE_FACTOR
-        yield timestamp, ask_price, bid_price
+    recs = np.frombuffer(raw, dtype=">u4").reshape(-1, 5)
+    timestamps = hour_epoch_ms(hour) + recs[:, 0].astype(np.int64)
+    ask_prices = recs[:, 1].astype(np.float64) / SCALE_FACTOR
+    bid_prices = recs[:, 2].astype(np.float64) / SCALE_FACTOR
+    return timestamps, ask_prices, bid_prices
 
 
 def main() -> None:
@@ -102,7 +101,7 @@ def main() -> None:
             writer.writerow(["timestamp", "askPrice", "bidPrice"])
 
             day_ticks = 0
-            for hour in iterate_hours(day_start, day_end):
+            for hour in hour_range(day_start, day_end):
                 try:
                     payload = download_hour(hour)
                 except URLError as exc:
@@ -110,9 +109,10 @@ def main() -> None:
                 except HTTPError as exc:
                     raise RuntimeError(f"HTTP error {exc.code} for {hour_url(hour)}") from exc
 
-                for timestamp, ask, bid in parse_ticks(hour, payload):
+                timestamps, asks, bids = parse_ticks(hour, payload)
+                for timestamp, ask, bid in zip(timestamps.tolist(), asks.tolist(), bids.tolist()):
                     writer.writerow([timestamp, f"{ask:.3f}", f"{bid:.3f}"])
-                    day_ticks += 1
+                day_ticks += len(timestamps)
 
         print(f"\u2714\ufe0f {daily_file.name}: {day_ticks} ticks")
         total_ticks += day_ticks